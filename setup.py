@@ -13,6 +13,7 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/asantaga/wiserheatingapi",
     packages=setuptools.find_packages(),
+    extras_require={"async": ["aiohttp"], "speedups": ["orjson"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -16,22 +16,47 @@ import logging
 import requests
 import json
 import os
-import re
+import threading
+import time
+
+from collections import namedtuple
+from functools import lru_cache, partial
+from types import MappingProxyType, SimpleNamespace
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+from urllib.parse import urljoin
+
+# orjson parses and serialises JSON several times faster than the
+# stdlib; fall back silently when the wheel is not installed
+# (pip install wiser-heating-api[speedups])
+try:
+    import orjson
+
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(payload):
+        return json.dumps(payload).encode("utf-8")
+
 
 _LOGGER = logging.getLogger(__name__)
 
 """
 Wiser Data URLS
 """
-WISERHUBURL = "http://{}/data/v2/domain/"
-WISERNETWORKURL = "http://{}/data/v2/network/"
-WISERMODEURL = "http://{}/data/v2/domain/System/RequestOverride"
-WISERSETROOMTEMP = "http://{}//data/v2/domain/Room/{}"
-WISERROOM = "http://{}//data/v2/domain/Room/{}"
-WISERSCHEDULEURL = "http://{}/data/v2/schedules/Heating/{}"
-WISERSCHEDULEGETURL = "http://{}/data/v2/schedules/"
-WISERSMARTPLUGURL = "http://{}/data/v2/domain/SmartPlug/{}"
-WISERSMARTPLUGSURL = "http://{}/data/v2/domain/SmartPlug"
+WISERBASEURL = "http://{}/data/v2/"
+WISERHUBURL = "domain/"
+WISERNETWORKURL = "network/"
+WISERMODEURL = "domain/System/RequestOverride"
+WISERSETROOMTEMP = "domain/Room/{}"
+WISERROOM = "domain/Room/{}"
+WISERSCHEDULEURL = "schedules/Heating/{}"
+WISERSCHEDULEGETURL = "schedules/"
+WISERSMARTPLUGURL = "domain/SmartPlug/{}"
+WISERSMARTPLUGSURL = "domain/SmartPlug"
 
 TEMP_MINIMUM = 5
 TEMP_MAXIMUM = 30
@@ -39,8 +64,315 @@ TEMP_OFF = -20
 
 TIMEOUT = (3.05, 6.5)
 
+# Wiser requires a temperature when patching the Hot Water state,
+# reflecting 'on' or 'off'
+DHWONTEMP = 1100
+DHWOFFTEMP = -200
+
+# Patch payloads built once at import and treated as read-only
+# templates; the boost and manual room modes depend on per-call state so
+# they are still built per call
+_HW_MODE_PATCH = {
+    "on": {"RequestOverride": {"Type": "Manual", "SetPoint": DHWONTEMP}},
+    "off": {"RequestOverride": {"Type": "Manual", "SetPoint": DHWOFFTEMP}},
+    "auto": {"RequestOverride": {"Type": "None", "Mode": "Auto"}},
+}
+
+_ROOM_MODE_AUTO_PATCH = {
+    "Mode": "Auto",
+    "RequestOverride": {
+        "Type": "None",
+        "DurationMinutes": 0,
+        "SetPoint": 0,
+        "Originator": "App",
+    },
+}
+
+_ROOM_MODE_OFF_PATCH = {
+    "Mode": "Manual",
+    "RequestOverride": {"Type": "Manual", "SetPoint": TEMP_OFF * 10},
+}
+
+# TTL in seconds for cached GET payloads, per endpoint: network state
+# rarely changes, schedules only change on user edits, domain (rooms,
+# devices, system) is the fast-moving payload
+_CACHE_TTLS = (
+    (WISERNETWORKURL, 60),
+    (WISERSCHEDULEGETURL, 30),
+    (WISERHUBURL, 5),
+)
+
+# Deletion table for bytes.translate keeping only printable ASCII
+# (0x20-0x7F), one C-level pass instead of a regex over the payload
+_DELETE_TABLE = bytes(i for i in range(256) if not 0x20 <= i <= 0x7F)
+
+_CacheEntry = namedtuple("_CacheEntry", ["timestamp", "ttl", "payload"])
+
+
+def _isReadTimeout(ex):
+    """
+    True when a requests.ConnectionError wraps an exhausted read-retry
+    budget: urllib3 raises MaxRetryError(reason=ReadTimeoutError), which
+    requests re-raises as ConnectionError rather than Timeout
+    """
+    reason = getattr(ex.args[0] if ex.args else None, "reason", None)
+    return isinstance(reason, ReadTimeoutError)
+
+
+def _cacheTTL(url):
+    for prefix, ttl in _CACHE_TTLS:
+        if url.startswith(prefix):
+            return ttl
+    return 0
+
+
+# Formatted per-id URLs are memoized; a hub has a small fixed set of
+# rooms, plugs and schedules so these caches stay tiny and every
+# steady-state call reuses the same interned string (which also keeps
+# the session-level resolved-URL cache hitting)
+
+
+@lru_cache(maxsize=64)
+def _roomUrl(roomId):
+    return WISERROOM.format(roomId)
+
+
+@lru_cache(maxsize=64)
+def _scheduleUrl(scheduleId):
+    return WISERSCHEDULEURL.format(scheduleId)
+
+
+@lru_cache(maxsize=64)
+def _smartPlugUrl(smartPlugId):
+    return WISERSMARTPLUGURL.format(smartPlugId)
+
+
+@lru_cache(maxsize=8)
+def _hotWaterUrl(DHWId):
+    return WISERHUBURL + "HotWater/{}/".format(DHWId)
+
+
 __VERSION__ = "1.0.7.2"
 
+"""
+HTTP Session Handling
+"""
+
+DEFAULT_RETRIES = 3
+
+
+def _makeRetry(num_retries):
+    # Split budgets: connect covers dead keep-alive sockets, read
+    # covers timeouts and mid-response resets, status covers 5xx,
+    # other catches the rest once. total caps the combined spend.
+    retry_kwargs = dict(
+        total=num_retries + 2,
+        connect=num_retries,
+        read=num_retries,
+        status=num_retries,
+        other=1,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        return Retry(backoff_jitter=0.25, **retry_kwargs)
+    except TypeError:
+        # backoff_jitter needs urllib3 >= 2.0
+        return Retry(**retry_kwargs)
+
+
+# Retry never mutates itself (increment() returns a copy), so one
+# instance is safely shared by every session built with the defaults
+_DEFAULT_RETRY = _makeRetry(DEFAULT_RETRIES)
+
+
+class _CustomHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter which applies a default timeout and the hub SECRET
+    header to requests that do not set them themselves
+    """
+
+    def __init__(self, timeout=None, hub_secret=None, **kwargs):
+        self.timeout = timeout
+        self._hub_secret = hub_secret
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+    def add_headers(self, request, **kwargs):
+        if self._hub_secret is not None:
+            request.headers.setdefault("SECRET", self._hub_secret)
+
+
+class CustomSession:
+    """
+    Wrapper around a requests.Session preconfigured for talking to the
+    wiser hub.
+
+    A single adapter instance (and therefore a single urllib3 connection
+    pool) is mounted for both http:// and https:// so keep-alive
+    connection reuse applies whichever scheme the hub is reached on.
+
+    The underlying Session is held by composition rather than
+    subclassed, with get/patch pre-bound via functools.partial, so each
+    call goes partial -> request -> Session.request instead of paying
+    the Session verb wrapper and super() dispatch frames on every call.
+
+    Instances may be shared between threads (e.g. Home Assistant's
+    executor pool): the session config is frozen after construction
+    (headers is a read-only view), the cookie jar serialises its own
+    mutations, and concurrent requests proceed in parallel through the
+    connection pool with pool_maxsize as the effective concurrency
+    ceiling. Instances also survive pickling and fork by rebuilding the
+    live session on restore rather than carrying sockets across.
+    """
+
+    def __init__(
+        self,
+        base_url=None,
+        hub_secret=None,
+        timeout=TIMEOUT,
+        num_retries=DEFAULT_RETRIES,
+        pool_connections=4,
+        pool_maxsize=20,
+        pool_block=True,
+    ):
+        self._base_url = base_url
+        self._hub_secret = hub_secret
+        self._timeout = timeout
+        self._num_retries = num_retries
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        # Resolved URL per relative path, the hub only has a handful of
+        # endpoints so this never grows beyond a few entries
+        self._url_cache = {}
+        self._buildSession()
+        self.warm()
+
+    def warm(self):
+        """
+        Eagerly establishes a pooled connection so the first real
+        request does not pay the TCP handshake. Failures are ignored,
+        the first request will surface any real problem.
+        """
+        if self._base_url is None:
+            return
+        try:
+            self._session.head(self._base_url, timeout=self._timeout)
+        except requests.RequestException:
+            pass
+
+    def get_cached(self, url):
+        """
+        GET a fixed endpoint through a cached PreparedRequest template,
+        skipping the per-request URL parsing, header/cookie merging and
+        hook wiring that Session.request performs. Only suitable for the
+        fixed polling endpoints, which take no per-call options.
+        """
+        prepared = self._prepared.get(url)
+        if prepared is None:
+            full_url = urljoin(self._base_url, url) if self._base_url else url
+            prepared = self._prepared[url] = self._session.prepare_request(
+                requests.Request("GET", full_url)
+            )
+        return self._session.send(prepared, timeout=self._timeout)
+
+    def _buildSession(self):
+        # PreparedRequest templates used by get_cached; belongs with the
+        # live session state so it is rebuilt on unpickle too
+        self._prepared = {}
+        self._session = requests.Session()
+        # The hub never sets cookies; a fresh jar (which locks its own
+        # mutations) avoids sharing cookie state with anything else
+        self._session.cookies = requests.cookies.RequestsCookieJar()
+        if self._num_retries == DEFAULT_RETRIES:
+            retry = _DEFAULT_RETRY
+        else:
+            retry = _makeRetry(self._num_retries)
+        adapter = _CustomHTTPAdapter(
+            timeout=self._timeout,
+            hub_secret=self._hub_secret,
+            max_retries=retry,
+            pool_connections=self._pool_connections,
+            pool_maxsize=self._pool_maxsize,
+            pool_block=self._pool_block,
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # Explicit keep-alive so an intermediate proxy does not downgrade
+        # the connection to close-per-request
+        self._session.headers["Connection"] = "keep-alive"
+        # Ask for compressed JSON: requests decompresses transparently
+        # and the domain payload shrinks several-fold when the hub
+        # supports it (harmless if it does not)
+        self._session.headers["Accept-Encoding"] = "gzip, deflate"
+        self._session.headers["Accept"] = "application/json"
+        # Read-only view, session headers must not be mutated once the
+        # session is shared between threads
+        self.headers = MappingProxyType(self._session.headers)
+        self.get = partial(self.request, "GET")
+        self.patch = partial(self.request, "PATCH")
+
+    def __getstate__(self):
+        # Live sockets, the header view and the bound partials cannot
+        # cross pickle/fork; they are rebuilt on restore
+        state = self.__dict__.copy()
+        for attr in ("_session", "_prepared", "headers", "get", "patch"):
+            state.pop(attr, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._buildSession()
+
+    def request(self, method, url, **kwargs):
+        if self._base_url is not None:
+            new_url = self._url_cache.get(url)
+            if new_url is None:
+                new_url = self._url_cache[url] = urljoin(self._base_url, url)
+            url = new_url
+        return self._session.request(method, url, **kwargs)
+
+    def close(self):
+        self._session.close()
+
+
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def getSession(base_url, hub_secret, **kwargs):
+    """
+    Returns the shared CustomSession for a (base_url, hub_secret) pair,
+    creating it on first use. Interning sessions this way keeps a single
+    connection pool per hub alive however many callers construct a
+    wiserHub for it.
+    """
+    key = (base_url, hub_secret)
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            session = _SESSIONS[key] = CustomSession(base_url, hub_secret, **kwargs)
+        return session
+
+
+def closeAllSessions():
+    """
+    Closes every shared session, for use on shutdown
+    """
+    with _SESSIONS_LOCK:
+        for session in _SESSIONS.values():
+            session.close()
+        _SESSIONS.clear()
+
+
 """
 Exception Handlers
 """
@@ -73,8 +405,9 @@ class WiserRESTException(Error):
 
 
 class WiserHubDataNull(Error):
-    _LOGGER.info("WiserHub data null after refresh")
-    pass
+    def __init__(self, msg="WiserHub data null after refresh"):
+        _LOGGER.info(msg)
+        super().__init__(msg)
 
 
 class WiserHubAuthenticationException(Error):
@@ -97,12 +430,13 @@ class wiserHub:
         self.wiserScheduleData = None
         self.hubIP = hubIP
         self.hubSecret = secret
-        self.headers = {
-            "SECRET": self.hubSecret,
-            "Content-Type": "application/json;charset=UTF-8",
-        }
+        # Pooled session shared by every caller of this hub; the SECRET
+        # header is stamped onto each request by the session's adapter
+        self._session = getSession(WISERBASEURL.format(hubIP), secret)
         # Dict holding Valve2Room mapping convinience variable
         self.device2roomMap = {}
+        # TTL cache of GET payloads keyed by URL, see _CACHE_TTLS
+        self._responseCache = {}
         self.refreshData()  # Issue first refresh in init
 
     def __toWiserTemp(self, temp):
@@ -147,89 +481,235 @@ class wiserHub:
             raise WiserHubDataNull("Hub data null even after refresh, aborting request")
         # Otherwise continue
 
-    def refreshData(self):
+    def _makeGetRequest(self, url, sanitize=False):
         """
-        Forces a refresh of data from the wiser hub
+        Issues a GET to the hub and returns the decoded JSON payload
+
+        param url: hub URL relative to the session base
+        param sanitize: strip non-printable characters before parsing,
+            needed for endpoints where the hub can emit invalid JSON
         return: JSON Data
         """
-
-        _LOGGER.info("Updating Wiser Hub Data")
+        ttl = _cacheTTL(url)
+        entry = self._responseCache.get(url)
+        if entry is not None and (time.monotonic() - entry.timestamp) < entry.ttl:
+            _LOGGER.debug("Returning cached response for {} ".format(url))
+            return entry.payload
+        resp = None
         try:
-            resp = requests.get(
-                WISERHUBURL.format(self.hubIP), headers=self.headers, timeout=TIMEOUT
-            )
-
+            resp = self._session.get_cached(url)
             resp.raise_for_status()
-            self.wiserHubData = resp.json()
-
-            _LOGGER.debug("Wiser Hub Data received {} ".format(self.wiserHubData))
-            if self.getRooms() is not None:
-                for room in self.getRooms():
-                    roomStatId = room.get("RoomStatId")
-                    if roomStatId is not None:
-                        # RoomStat found add it to the list
-                        self.device2roomMap[roomStatId] = {
-                            "roomId": room.get("id"),
-                            "roomName": room.get("Name"),
-                        }
-                    smartValves = room.get("SmartValveIds")
-                    if smartValves is not None:
-                        for valveId in smartValves:
-                            self.device2roomMap[valveId] = {
-                                "roomId": room.get("id"),
-                                "roomName": room.get("Name"),
-                            }
-                    # Show warning if room contains no devices.
-                    if roomStatId is None and smartValves is None:
-                        # No devices in room
-                        _LOGGER.warning(
-                            "Room {} doesn't contain any smart valves or thermostats.".format(
-                                room.get("Name")
-                            )
-                        )
-                _LOGGER.debug(" valve2roomMap{} ".format(self.device2roomMap))
-            else:
-                _LOGGER.warning("Wiser found no rooms")
-
-            # The Wiser Heat Hub can return invalid JSON, so remove all non-printable characters before trying to parse JSON
-            if self.wiserNetworkData is None:
-                responseContent = requests.get(
-                WISERNETWORKURL.format(self.hubIP),
-                headers=self.headers,
-                timeout=TIMEOUT,
-                ).content
-                responseContent = re.sub(rb"[^\x20-\x7F]+", b"", responseContent)
-                self.wiserNetworkData = json.loads(responseContent)
-
-            if self.wiserScheduleData is None:
-                self.wiserScheduleData = requests.get(
-                WISERSCHEDULEGETURL.format(self.hubIP),
-                headers=self.headers,
-                timeout=TIMEOUT,
-                ).json()
-
-
-        except requests.Timeout:
+        except (requests.Timeout, requests.ConnectionError) as ex:
+            # GETs have a read-retry budget, so a slow hub surfaces as a
+            # ConnectionError wrapping a ReadTimeoutError rather than a
+            # plain Timeout; both get the timeout treatment
+            if isinstance(ex, requests.ConnectionError) and not _isReadTimeout(ex):
+                _LOGGER.debug("Connection error trying to update from Wiser Hub")
+                raise
             _LOGGER.debug("Connection timed out trying to update from Wiser Hub")
+            if entry is not None:
+                # Fall back to the last good payload rather than failing
+                # a whole polling cycle on one slow response
+                _LOGGER.warning(
+                    "Wiser Hub timed out, returning stale data for {} ".format(url)
+                )
+                return entry.payload
             raise WiserHubTimeoutException("The connection timed out.")
         except requests.HTTPError:
-            if self.wiserHubData.status_code == 401:
+            status = resp.status_code if resp is not None else None
+            if status == 401:
                 raise WiserHubAuthenticationException(
                     "Authentication error.  Check secret key."
                 )
-            elif self.wiserHubData.status_code == 404:
+            elif status in (404, 405):
                 raise WiserRESTException("Not Found.")
             else:
                 raise WiserRESTException("Unknown Error.")
+        content = resp.content
+        if sanitize:
+            content = content.translate(None, _DELETE_TABLE)
+        payload = _loads(content)
+        if ttl:
+            self._responseCache[url] = _CacheEntry(time.monotonic(), ttl, payload)
+        return payload
+
+    def _makePatchRequest(self, url, patchData):
+        """
+        Issues a PATCH to the hub and maps HTTP failures onto the module
+        exceptions
+
+        param url: hub URL relative to the session base
+        param patchData: JSON body for the patch
+        return: Response
+        """
+        _LOGGER.debug("Patching {} with {} ".format(url, patchData))
+        resp = None
+        try:
+            # Serialise ourselves and send bytes, bypassing requests'
+            # slower default JSON encoding
+            resp = self._session.patch(
+                url,
+                data=_dumps(patchData),
+                headers={"Content-Type": "application/json"},
+            )
+            resp.raise_for_status()
+        except requests.Timeout:
+            _LOGGER.debug("Connection timed out patching the Wiser Hub")
+            raise WiserHubTimeoutException("The connection timed out.")
+        except requests.HTTPError:
+            status = resp.status_code if resp is not None else None
+            _LOGGER.debug("Patch to {} Response code = {}".format(url, status))
+            if status == 401:
+                raise WiserHubAuthenticationException(
+                    "Authentication error.  Check secret key."
+                )
+            elif status in (404, 405):
+                raise WiserNotFound("{} not found error".format(url))
+            else:
+                raise WiserRESTException(
+                    "Error patching {} , error {} {}".format(
+                        url, status, resp.text if resp is not None else ""
+                    )
+                )
         except requests.ConnectionError:
-            _LOGGER.debug("Connection error trying to update from Wiser Hub")
+            _LOGGER.debug("Connection error patching the Wiser Hub")
             raise
+        # The write changed hub state, so drop the cached payload for the
+        # endpoint group it touched
+        self.invalidate(url.split("/", 1)[0] + "/")
+        return resp
+
+    def invalidate(self, url_prefix=""):
+        """
+        Drops cached GET payloads whose URL starts with url_prefix, so
+        the next read after a write fetches fresh data from the hub
+
+        param url_prefix: e.g. "domain/"; empty string clears everything
+        """
+        for cached_url in list(self._responseCache):
+            if cached_url.startswith(url_prefix):
+                del self._responseCache[cached_url]
+
+    def updateHubData(self):
+        """
+        Fetches the domain data (rooms, devices, system) from the hub
+        return: JSON Data
+        """
+        self.wiserHubData = self._makeGetRequest(WISERHUBURL)
+        self._buildIndexes()
+        return self.wiserHubData
+
+    def updateNetworkData(self):
+        """
+        Fetches the network data from the hub. The Wiser Heat Hub can
+        return invalid JSON here, so all non-printable characters are
+        removed before parsing
+        return: JSON Data
+        """
+        self.wiserNetworkData = self._makeGetRequest(WISERNETWORKURL, sanitize=True)
+        return self.wiserNetworkData
+
+    def updateScheduleData(self):
+        """
+        Fetches the schedule data from the hub
+        return: JSON Data
+        """
+        self.wiserScheduleData = self._makeGetRequest(WISERSCHEDULEGETURL)
+        self._scheduleById = {
+            schedule.get("id"): schedule
+            for schedule in self.wiserScheduleData.get("Heating") or []
+        }
+        return self.wiserScheduleData
+
+    def _buildIndexes(self):
+        """
+        Builds {id: object} lookup dicts from the domain data so the
+        single-entity getters are hash lookups instead of linear scans.
+        The device2roomMap convinience dict is rebuilt in the same pass
+        over the rooms
+        """
+        rooms = self.wiserHubData.get("Room")
+        self._roomById = {room.get("id"): room for room in rooms or []}
+        self._deviceById = {
+            device.get("id"): device
+            for device in self.wiserHubData.get("Device") or []
+        }
+        self._roomStatById = {
+            roomStat.get("id"): roomStat
+            for roomStat in self.wiserHubData.get("RoomStat") or []
+        }
+        self._smartPlugById = {
+            plug.get("id"): plug for plug in self.wiserHubData.get("SmartPlug") or []
+        }
+        # One immutable-by-convention snapshot per refresh, replaced
+        # atomically, so getters called back-to-back in a polling tick
+        # share the same pre-resolved views instead of re-walking the
+        # payload dict chains
+        hotwater = self.wiserHubData.get("HotWater")
+        self._snapshot = SimpleNamespace(
+            rooms=self._roomById,
+            devices=self._deviceById,
+            smartplugs=self._smartPlugById,
+            hotwater=hotwater[0] if hotwater else None,
+            heatingChannels=self.wiserHubData.get("HeatingChannel") or [],
+        )
+        if rooms is not None:
+            for room in rooms:
+                # All devices in a room share one info dict, so this
+                # allocates per room rather than per device
+                info = {
+                    "roomId": room.get("id"),
+                    "roomName": room.get("Name"),
+                }
+                roomStatId = room.get("RoomStatId")
+                if roomStatId is not None:
+                    # RoomStat found add it to the list
+                    self.device2roomMap[roomStatId] = info
+                smartValves = room.get("SmartValveIds")
+                if smartValves is not None:
+                    for valveId in smartValves:
+                        self.device2roomMap[valveId] = info
+                # Show warning if room contains no devices.
+                if roomStatId is None and smartValves is None:
+                    # No devices in room
+                    _LOGGER.warning(
+                        "Room {} doesn't contain any smart valves or thermostats.".format(
+                            room.get("Name")
+                        )
+                    )
+            _LOGGER.debug(" valve2roomMap{} ".format(self.device2roomMap))
+        else:
+            _LOGGER.warning("Wiser found no rooms")
+
+    def refreshData(self):
+        """
+        Forces a refresh of data from the wiser hub
+        return: JSON Data
+        """
+
+        _LOGGER.info("Updating Wiser Hub Data")
+        self.updateHubData()
+        _LOGGER.debug("Wiser Hub Data received {} ".format(self.wiserHubData))
+
+        if self.wiserNetworkData is None:
+            self.updateNetworkData()
+
+        if self.wiserScheduleData is None:
+            self.updateScheduleData()
 
         # Add v2 Schedule data to v2 Hub data so existing HA component will still work
         self.wiserHubData['Schedule'] = self.wiserScheduleData['Heating']
 
         return self.wiserHubData
 
+    def close(self):
+        """
+        Releases the pooled connections to the hub, for use on shutdown.
+        Note the session is shared between hub objects for the same hub
+        IP and secret, so this closes it for all of them
+        """
+        self._session.close()
+
     def getHubData(self):
         """
         Retrieves the full JSON payload ,
@@ -270,10 +750,10 @@ class wiserHub:
         if self.wiserHubData.get("Room") is None:
             _LOGGER.warning("getRoom called but no rooms found")
             raise WiserNoRoomsFound("No rooms found in Wiser payload")
-        for room in self.wiserHubData.get("Room"):
-            if room.get("id") == roomId:
-                return room
-        raise WiserNotFound("Room {} not found".format(roomId))
+        try:
+            return self._roomById[roomId]
+        except KeyError:
+            raise WiserNotFound("Room {} not found".format(roomId))
 
     def getSystem(self):
         """
@@ -328,10 +808,10 @@ class wiserHub:
         if self.wiserHubData.get("Device") is None:
             _LOGGER.warning("getRoom called but no rooms found")
             raise WiserNoRoomsFound("getRoom called but no rooms found")
-        for device in self.wiserHubData.get("Device"):
-            if device.get("id") == deviceId:
-                return device
-        raise WiserNotFound("Device {} not found ".format(deviceId))
+        try:
+            return self._deviceById[deviceId]
+        except KeyError:
+            raise WiserNotFound("Device {} not found ".format(deviceId))
 
     def getDeviceRoom(self, deviceId):
         """
@@ -357,8 +837,7 @@ class wiserHub:
         # self.checkHubData()
         heatingRelayStatus = "Off"
         # There could be multiple heating channels,
-        heatingChannels = self.getHeatingChannels()
-        for heatingChannel in heatingChannels:
+        for heatingChannel in self._snapshot.heatingChannels:
             if heatingChannel.get("HeatingRelayState") == "On":
                 heatingRelayStatus = "On"
         return heatingRelayStatus
@@ -373,54 +852,39 @@ class wiserHub:
         """
         If there is no hotwater object then return false
         """
-        if not self.wiserHubData.get("HotWater"):
+        if self._snapshot.hotwater is None:
             return False
 
-        return self.wiserHubData.get("HotWater")[0].get("WaterHeatingState")
+        return self._snapshot.hotwater.get("WaterHeatingState")
 
-    def setHotwaterMode(self, mode):
-        """
-          Switch Hot Water on or off manually, or reset to 'Auto' (schedule).
-          'mode' can be "on", "off" or "auto".
+    def _buildHotwaterModePatch(self, mode):
         """
+        Validates a hot water mode and builds the URL and payload to
+        patch for it, shared with the async variant
 
-        # Wiser requires a temperature when patching the Hot Water state,
-        # reflecting 'on' or 'off'
-        DHWOnTemp = 1100
-        DHWOffTemp = -200
-
-        modeMapping = {
-            "on": {"RequestOverride": {"Type": "Manual", "SetPoint": DHWOnTemp}},
-            "off": {"RequestOverride": {"Type": "Manual", "SetPoint": DHWOffTemp}},
-            "auto": {"RequestOverride": {"Type": "None", "Mode": "Auto"}},
-        }
-
+        param mode: on, off or auto
+        return: (url, patchData)
+        """
         _mode = mode.lower()
-        if _mode not in ["on", "off", "auto"]:
+        patchData = _HW_MODE_PATCH.get(_mode)
+        if patchData is None:
             raise ValueError(
                 "Hot Water can be either 'on', 'off' or 'auto' - not '%s'" % _mode
             )
 
         # Obtain our DHW control ID
-        if self.wiserHubData is None:
-            self.refreshData()
+        self.checkHubData()
         DHWId = self.wiserHubData.get("HotWater")[0].get("id")
+        _url = _hotWaterUrl(DHWId)
+        return _url, patchData
 
-        _url = WISERHUBURL.format(self.hubIP) + "/HotWater/{}/".format(DHWId)
-        _LOGGER.debug(
-            "Sending Patch Data: {}, to URL [{}]".format(modeMapping.get(_mode), _url)
-        )
-        response = requests.patch(
-            url=_url, headers=self.headers, json=modeMapping.get(_mode)
-        )
-        if response.status_code != 200:
-            _LOGGER.debug("Set DHW Response code = {}".format(response.status_code))
-            raise WiserRESTException(
-                "Error setting hot water mode to {}, error {} {}".format(
-                    _mode, response.status_code, response.text
-                )
-            )
-
+    def setHotwaterMode(self, mode):
+        """
+          Switch Hot Water on or off manually, or reset to 'Auto' (schedule).
+          'mode' can be "on", "off" or "auto".
+        """
+        _url, patchData = self._buildHotwaterModePatch(mode)
+        self._makePatchRequest(_url, patchData)
         return True
 
     def setSystemSwitch(self, switch, mode=False):
@@ -431,24 +895,7 @@ class wiserHub:
         :return:
         """
         patchData = {switch: mode}
-        url = WISERHUBURL + "System"
-
-        _LOGGER.debug("patchdata {} ".format(patchData))
-        response = requests.patch(
-            url=url.format(self.hubIP),
-            headers=self.headers,
-            json=patchData,
-            timeout=TIMEOUT,
-        )
-        if response.status_code != 200:
-            _LOGGER.debug(
-                "Set {} Response code = {}".format(switch, response.status_code)
-            )
-            raise WiserRESTException(
-                "Error setting {} , error {} {}".format(
-                    switch, response.status_code, response.text
-                )
-            )
+        self._makePatchRequest(WISERHUBURL + "System", patchData)
 
     def getRoomStatData(self, deviceId):
         """
@@ -463,15 +910,12 @@ class wiserHub:
             _LOGGER.warning("getRoomStatData called but no RoomStats found")
             raise WiserNotFound("deviceID {} not found ".format(deviceId))
 
-        for roomStat in self.wiserHubData["RoomStat"]:
-            if roomStat.get("id") == deviceId:
-                return roomStat
-        """
-        If we get here then the deviceId was not found
-        """
-        raise WiserNotFound(
-            "getRoomStatData for deviceID {} not found due".format(deviceId)
-        )
+        try:
+            return self._roomStatById[deviceId]
+        except KeyError:
+            raise WiserNotFound(
+                "getRoomStatData for deviceID {} not found due".format(deviceId)
+            )
 
     def getRoomSchedule(self, roomId):
         """
@@ -482,14 +926,12 @@ class wiserHub:
         """
         self.checkHubData()
 
-        if self.getRoom(roomId) is None:
-            raise WiserNotFound("getRoomSchedule for room {} not found ".format(roomId))
-
+        # getRoom raises WiserNotFound itself when the room is missing
         scheduleId = self.getRoom(roomId).get("ScheduleId")
         if scheduleId is not None:
-            for schedule in self.wiserHubData.get("Schedule"):
-                if schedule.get("id") == scheduleId:
-                    return schedule
+            schedule = self._scheduleById.get(scheduleId)
+            if schedule is not None:
+                return schedule
             raise WiserNotFound("getRoomSchedule for room {} not found ".format(roomId))
         else:
             raise WiserNotFound("getRoomSchedule for room {} not found ".format(roomId))
@@ -504,26 +946,9 @@ class wiserHub:
         """
         scheduleId = self.getRoom(roomId).get("ScheduleId")
 
-        if scheduleId is not None:
-            patchData = scheduleData
-            response = requests.patch(
-                url=WISERSCHEDULEURL.format(self.hubIP, scheduleId),
-                headers=self.headers,
-                json=patchData,
-                timeout=TIMEOUT,
-            )
-
-            if response.status_code != 200:
-                _LOGGER.debug(
-                    "Set Schedule Response code = {}".format(response.status_code)
-                )
-                raise WiserRESTException(
-                    "Error setting schedule for room {} , error {} {}".format(
-                        roomId, response.status_code, response.text
-                    )
-                )
-        else:
+        if scheduleId is None:
             raise WiserNotFound("No schedule found that matches roomId")
+        self._makePatchRequest(_scheduleUrl(scheduleId), scheduleData)
 
     def setRoomScheduleFromFile(self, roomId, scheduleFile: str):
         """
@@ -535,39 +960,19 @@ class wiserHub:
         """
         scheduleId = self.getRoom(roomId).get("ScheduleId")
 
-        if scheduleId is not None:
-            if os.path.exists(scheduleFile):
-                try:
-                    with open(scheduleFile, "r") as f:
-                        scheduleData = json.load(f)
-                except:
-                    raise Exception("Error reading file {}".format(scheduleFile))
-
-                patchData = scheduleData
-                response = requests.patch(
-                    url=WISERSCHEDULEURL.format(self.hubIP, scheduleId),
-                    headers=self.headers,
-                    json=patchData,
-                    timeout=TIMEOUT,
-                )
-
-                if response.status_code != 200:
-                    _LOGGER.debug(
-                        "Set Schedule Response code = {}".format(response.status_code)
-                    )
-                    raise WiserRESTException(
-                        "Error setting schedule for room {} , error {} {}".format(
-                            roomId, response.status_code, response.text
-                        )
-                    )
-            else:
-                raise FileNotFoundError(
-                    "Schedule file, {}, not found.".format(
-                        os.path.abspath(scheduleFile)
-                    )
-                )
-        else:
+        if scheduleId is None:
             raise WiserNotFound("No schedule found that matches roomId")
+        if not os.path.exists(scheduleFile):
+            raise FileNotFoundError(
+                "Schedule file, {}, not found.".format(os.path.abspath(scheduleFile))
+            )
+        try:
+            with open(scheduleFile, "r") as f:
+                scheduleData = json.load(f)
+        except:
+            raise Exception("Error reading file {}".format(scheduleFile))
+
+        self._makePatchRequest(_scheduleUrl(scheduleId), scheduleData)
 
     def copyRoomSchedule(self, fromRoomId, toRoomId):
         """
@@ -590,18 +995,15 @@ class wiserHub:
                 "Error copying schedule.  One of the room Ids is not valid"
             )
 
-    def setHomeAwayMode(self, mode, temperature=10):
+    def _buildHomeAwayPatch(self, mode, temperature):
         """
-        Sets default Home or Away mode, optionally allows you to set a temperature for away mode
+        Validates a home/away mode change and builds the payload to
+        patch for it, shared with the async variant
 
-        param mode: HOME   | AWAY
-
-        param temperature: Temperature between 5-30C or -20 for OFF
-
-        return:
+        param mode: HOME | AWAY
+        param temperature: Away mode temperature
+        return: patchData
         """
-        _LOGGER.info("Setting Home/Away mode to : {} {} C".format(mode, temperature))
-
         if mode not in ["HOME", "AWAY"]:
             raise ValueError("setAwayHome can only be HOME or AWAY")
 
@@ -614,89 +1016,71 @@ class wiserHub:
                         TEMP_MINIMUM, TEMP_MAXIMUM, TEMP_OFF
                     )
                 )
-        _LOGGER.info("Setting Home/Away : {}".format(mode))
+            return {"type": 2, "setPoint": self.__toWiserTemp(temperature)}
+        return {"type": 0, "setPoint": 0}
 
-        if mode == "AWAY":
-            patchData = {"type": 2, "setPoint": self.__toWiserTemp(temperature)}
-        else:
-            patchData = {"type": 0, "setPoint": 0}
-        _LOGGER.debug("patchdata {} ".format(patchData))
-        response = requests.patch(
-            url=WISERMODEURL.format(self.hubIP),
-            headers=self.headers,
-            json=patchData,
-            timeout=TIMEOUT,
-        )
-        if response.status_code != 200:
-            _LOGGER.debug(
-                "Set Home/Away Response code = {}".format(response.status_code)
-            )
-            raise ValueError(
-                "Error setting Home/Away , error {} {}".format(
-                    response.status_code, response.text
-                )
-            )
+    def setHomeAwayMode(self, mode, temperature=10):
+        """
+        Sets default Home or Away mode, optionally allows you to set a temperature for away mode
 
-    def setRoomTemperature(self, roomId, temperature):
+        param mode: HOME   | AWAY
+
+        param temperature: Temperature between 5-30C or -20 for OFF
+
+        return:
         """
-        Sets the room temperature
-        param roomId:  The Room ID
-        param temperature:  The temperature in celcius from 5 to 30, -20 for Off
+        _LOGGER.info("Setting Home/Away mode to : {} {} C".format(mode, temperature))
+        patchData = self._buildHomeAwayPatch(mode, temperature)
+        self._makePatchRequest(WISERMODEURL, patchData)
+
+    def _buildRoomTempPatch(self, temperature):
+        """
+        Validates a room temperature and builds the payload to patch
+        for it, shared with the async variant
+
+        param temperature: temperature in celcius
+        return: patchData
         """
-        _LOGGER.info("Set Room {} Temperature to = {} ".format(roomId, temperature))
         if not (self.__checkTempRange(temperature)):
             raise ValueError(
                 "SetRoomTemperature : value of temperature must be between {} and {} OR {} (off)".format(
                     TEMP_MINIMUM, TEMP_MAXIMUM, TEMP_OFF
                 )
             )
-        patchData = {
+        return {
             "RequestOverride": {
                 "Type": "Manual",
                 "SetPoint": self.__toWiserTemp(temperature),
             }
         }
-        response = requests.patch(
-            WISERSETROOMTEMP.format(self.hubIP, roomId),
-            headers=self.headers,
-            json=patchData,
-            timeout=TIMEOUT,
-        )
-        if response.status_code != 200:
-            _LOGGER.error(
-                "Set Room {} Temperature to = {} resulted in {}".format(
-                    roomId, temperature, response.status_code
-                )
-            )
-            raise WiserRESTException(
-                "Error setting temperature, error {} ".format(response.text)
-            )
-        _LOGGER.debug(
-            "Set room Temp, error {} ({})".format(response.status_code, response.text)
-        )
 
-    # Set Room Mode (Manual, Boost,Off or Auto )
-    # If set to off then the trv goes to manual and temperature of -200
-    #
-    def setRoomMode(self, roomId, mode, boost_temp=20, boost_temp_time=30):
+    def setRoomTemperature(self, roomId, temperature):
         """
-        Set the Room Mode, this can be Auto, Manual, off or Boost. When you set the mode back to Auto it will automatically take the scheduled temperature
-
-        param roomId: RoomId
-
-        param mode:  Mode (auto, manual off, or boost)
-
-        param boost_temp:  If boosting enter the temperature here in C, can be between 5-30
+        Sets the room temperature
+        param roomId:  The Room ID
+        param temperature:  The temperature in celcius from 5 to 30, -20 for Off
+        """
+        _LOGGER.info("Set Room {} Temperature to = {} ".format(roomId, temperature))
+        patchData = self._buildRoomTempPatch(temperature)
+        self._makePatchRequest(_roomUrl(roomId), patchData)
 
-        param boost_temp_time:  How long to boost for in minutes
+    def _buildRoomModePatch(self, roomId, mode, boost_temp, boost_temp_time):
+        """
+        Validates a room mode change and builds the payload to patch
+        for it, shared with the async variant
 
+        param roomId: RoomId
+        param mode: auto, boost, manual or off
+        param boost_temp: boost temperature in celcius
+        param boost_temp_time: boost duration in minutes
+        return: patchData
         """
-        # TODO
-        _LOGGER.debug("Set Mode {} for a room {} ".format(mode, roomId))
-        if mode.lower() == "auto":
-            # Do Auto
-            patchData = {"Mode": "Auto"}
-        elif mode.lower() == "boost":
+        _mode = mode.lower()
+        if _mode == "auto":
+            # Do Auto, cancelling any current boost in the same patch
+            # rather than with a separate round trip
+            patchData = _ROOM_MODE_AUTO_PATCH
+        elif _mode == "boost":
             if boost_temp < TEMP_MINIMUM or boost_temp > TEMP_MAXIMUM:
                 raise ValueError(
                     "Boost temperature is set to {}. Boost temperature can only be between {} and {}.".format(
@@ -716,7 +1100,7 @@ class wiserHub:
                     "Originator": "App",
                 }
             }
-        elif mode.lower() == "manual":
+        elif _mode == "manual":
             # When setting to manual , set the temp to the current scheduled temp
             setTemp = self.__fromWiserTemp(
                 self.getRoom(roomId).get("ScheduledSetPoint")
@@ -731,63 +1115,38 @@ class wiserHub:
                 },
             }
         # Implement trv off as per https://github.com/asantaga/wiserheatingapi/issues/3
-        elif mode.lower() == "off":
-            patchData = {
-                "Mode": "Manual",
-                "RequestOverride": {
-                    "Type": "Manual",
-                    "SetPoint": self.__toWiserTemp(TEMP_OFF),
-                },
-            }
+        elif _mode == "off":
+            patchData = _ROOM_MODE_OFF_PATCH
         else:
             raise ValueError(
                 "Error setting setting room mode, received  {} but should be auto,boost,off or manual ".format(
                     mode
                 )
             )
+        return patchData
 
-        # if not a boost operation cancel any current boost
-        if mode.lower() != "boost":
-            cancelBoostPostData = {
-                "RequestOverride": {
-                    "Type": "None",
-                    "DurationMinutes": 0,
-                    "SetPoint": 0,
-                    "Originator": "App",
-                }
-            }
+    # Set Room Mode (Manual, Boost,Off or Auto )
+    # If set to off then the trv goes to manual and temperature of -200
+    #
+    def setRoomMode(self, roomId, mode, boost_temp=20, boost_temp_time=30):
+        """
+        Set the Room Mode, this can be Auto, Manual, off or Boost. When you set the mode back to Auto it will automatically take the scheduled temperature
 
-            response = requests.patch(
-                WISERROOM.format(self.hubIP, roomId),
-                headers=self.headers,
-                json=cancelBoostPostData,
-                timeout=TIMEOUT,
-            )
-            if response.status_code != 200:
-                _LOGGER.error(
-                    "Cancelling boost resulted in {}".format(response.status_code)
-                )
-                raise WiserRESTException("Error cancelling boost {} ".format(mode))
-
-        # Set new mode
-        response = requests.patch(
-            WISERROOM.format(self.hubIP, roomId),
-            headers=self.headers,
-            json=patchData,
-            timeout=TIMEOUT,
-        )
-        if response.status_code != 200:
-            _LOGGER.error(
-                "Set Room {} to Mode {} resulted in {}".format(
-                    roomId, mode, response.status_code
-                )
-            )
-            raise WiserRESTException(
-                "Error setting mode to {}, error {} ".format(mode, response.text)
-            )
-        _LOGGER.debug(
-            "Set room mode, error {} ({})".format(response.status_code, response.text)
-        )
+        param roomId: RoomId
+
+        param mode:  Mode (auto, manual off, or boost)
+
+        param boost_temp:  If boosting enter the temperature here in C, can be between 5-30
+
+        param boost_temp_time:  How long to boost for in minutes
+
+        """
+        _LOGGER.debug("Set Mode {} for a room {} ".format(mode, roomId))
+        # The patch carries a RequestOverride alongside the mode for the
+        # non-boost modes, so a single request also cancels any current
+        # boost
+        patchData = self._buildRoomModePatch(roomId, mode, boost_temp, boost_temp_time)
+        self._makePatchRequest(_roomUrl(roomId), patchData)
 
     def getSmartPlugs(self):
         self.checkHubData()
@@ -795,28 +1154,23 @@ class wiserHub:
 
     def getSmartPlug(self, smartPlugId):
         self.checkHubData()
-        if self.getHubData().get("SmartPlug") is not None:
-            for plug in self.getHubData().get("SmartPlug"):
-                if plug.get("id") == smartPlugId:
-                    return plug
-        # If we get here then the plug was not found
+        plug = self._smartPlugById.get(smartPlugId)
+        if plug is not None:
+            return plug
         raise WiserNotFound("Unable to find smartPlug {}".format(smartPlugId))
 
     def getSmartPlugState(self, smartPlugId):
         self.checkHubData()
-        if self.getHubData().get("SmartPlug") is not None:
-            for plug in self.getHubData().get("SmartPlug"):
-
-                if plug.get("id") == smartPlugId:
-                    if plug.get("OutputState") is None:
-                        raise WiserNotFound(
-                            "Unable to get State of smartPlug {}, is it offline?".format(
-                                smartPlugId
-                            )
-                        )
-                    else:
-                        return plug.get("ScheduledState")
-        # If we get here then the plug was not found
+        plug = self._smartPlugById.get(smartPlugId)
+        if plug is not None:
+            if plug.get("OutputState") is None:
+                raise WiserNotFound(
+                    "Unable to get State of smartPlug {}, is it offline?".format(
+                        smartPlugId
+                    )
+                )
+            else:
+                return plug.get("ScheduledState")
         raise WiserNotFound("Unable to find smartPlug {}".format(smartPlugId))
 
     def setSmartPlugState(self, smartPlugId, smartPlugState):
@@ -827,41 +1181,14 @@ class wiserHub:
             _LOGGER.error("SmartPlug State must be either On or Off")
             raise ValueError("SmartPlug State must be either On or Off")
 
-        url = WISERSMARTPLUGURL.format(self.hubIP, smartPlugId)
         patchData = {"RequestOutput": smartPlugState.title()}
-
-        _LOGGER.debug("Setting smartplug status patchdata {} ".format(patchData))
-        response = requests.patch(
-            url=url.format(self.hubIP),
-            headers=self.headers,
-            json=patchData,
-            timeout=TIMEOUT,
-        )
-        if response.status_code != 200:
-            if response.status_code == 404:
-                _LOGGER.debug("Set smart plug not found error ")
-                raise WiserNotFound(
-                    "Set smart plug {} not found error".format(smartPlugId)
-                )
-            else:
-                _LOGGER.debug(
-                    "Set smart plug error {} Response code = {}".format(
-                        response.text, response.status_code
-                    )
-                )
-                raise WiserRESTException(
-                    "Error setting smartplug mode, msg {} , error {}".format(
-                        response.status_code, response.text
-                    )
-                )
+        self._makePatchRequest(_smartPlugUrl(smartPlugId), patchData)
 
     def getSmartPlugMode(self, smartPlugId):
         self.checkHubData()
-        if self.getHubData().get("SmartPlug") is not None:
-            for plug in self.getHubData().get("SmartPlug"):
-                if plug.get("id") == smartPlugId:
-                    return plug.get("Mode")
-        # If we get here then the plug was not found
+        plug = self._smartPlugById.get(smartPlugId)
+        if plug is not None:
+            return plug.get("Mode")
         raise WiserNotFound("Unable to find smartPlug {}".format(smartPlugId))
 
     def setSmartPlugMode(self, smartPlugId, smartPlugMode):
@@ -870,30 +1197,5 @@ class wiserHub:
             _LOGGER.error("SmartPlug Mode must be either Auto or Manual")
             raise ValueError("SmartPlug Mode must be either Auto or Manual")
 
-        url = WISERSMARTPLUGURL.format(self.hubIP, smartPlugId)
         patchData = {"Mode": smartPlugMode.title()}
-
-        _LOGGER.debug("Setting smartplug status patchdata {} ".format(patchData))
-        response = requests.patch(
-            url=url.format(self.hubIP),
-            headers=self.headers,
-            json=patchData,
-            timeout=TIMEOUT,
-        )
-        if response.status_code != 200:
-            if response.status_code == 404:
-                _LOGGER.debug("Set smart plug not found error ")
-                raise WiserNotFound(
-                    "Set smart plug {} not found error".format(smartPlugId)
-                )
-            else:
-                _LOGGER.debug(
-                    "Set smart plug error {} Response code = {}".format(
-                        response.text, response.status_code
-                    )
-                )
-                raise WiserRESTException(
-                    "Error setting smartplug mode, msg {} , error {}".format(
-                        response.status_code, response.text
-                    )
-                )
+        self._makePatchRequest(_smartPlugUrl(smartPlugId), patchData)
@@ -0,0 +1,592 @@
+"""
+# Wiser API Facade - async variant
+
+Async counterpart of the session handling in wiserHub, for use from
+asyncio code such as Home Assistant's event loop. Requires the optional
+aiohttp dependency (pip install wiser-heating-api[async]).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+from urllib.parse import urljoin
+
+import aiohttp
+
+from .wiserHub import (
+    TIMEOUT,
+    _CacheEntry,
+    _DELETE_TABLE,
+    _dumps,
+    _loads,
+    _roomUrl,
+    _scheduleUrl,
+    _smartPlugUrl,
+    _cacheTTL,
+    WISERBASEURL,
+    WISERHUBURL,
+    WISERMODEURL,
+    WISERNETWORKURL,
+    WISERSCHEDULEGETURL,
+    WiserHubAuthenticationException,
+    WiserHubDataNull,
+    WiserHubTimeoutException,
+    WiserNotFound,
+    WiserRESTException,
+    wiserHub,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Ceilings for the batch entry points; the hub is a small embedded
+# device and should not see an unbounded fan-out
+_BATCH_CONCURRENCY = 8
+_BATCH_LIMIT = 100
+
+# Debounce window for coalescing rapid setRoomTemperature calls (e.g. a
+# slider drag) into one PATCH per room carrying the final value
+_TEMP_DEBOUNCE_SECONDS = 0.25
+
+
+class AsyncCustomSession:
+    """
+    aiohttp-backed counterpart of CustomSession.
+
+    One ClientSession (and therefore one keep-alive connection pool) is
+    shared by every call, so N concurrent polls run on the event loop
+    thread over pooled connections instead of each occupying an executor
+    thread and its own socket.
+    """
+
+    def __init__(self, base_url=None, hub_secret=None, timeout=TIMEOUT, pool_maxsize=8):
+        self._base_url = base_url
+        # Resolved URL per relative path, as in CustomSession. Resolving
+        # here rather than via aiohttp's base_url keeps older aiohttp
+        # releases working (base_url paths need aiohttp >= 3.10)
+        self._url_cache = {}
+        # Ask for compressed JSON: aiohttp decompresses transparently
+        # and the domain payload shrinks several-fold when the hub
+        # supports it (harmless if it does not)
+        self._headers = {
+            "Accept-Encoding": "gzip, deflate",
+            "Accept": "application/json",
+        }
+        if hub_secret is not None:
+            self._headers["SECRET"] = hub_secret
+        connect_timeout, read_timeout = timeout
+        self._timeout = aiohttp.ClientTimeout(
+            connect=connect_timeout, sock_read=read_timeout
+        )
+        self._pool_maxsize = pool_maxsize
+        self._client = None
+
+    def _getClient(self):
+        # Created lazily so the session object itself can be constructed
+        # outside a running event loop
+        if self._client is None:
+            self._client = aiohttp.ClientSession(
+                headers=self._headers,
+                timeout=self._timeout,
+                connector=aiohttp.TCPConnector(
+                    limit=self._pool_maxsize, keepalive_timeout=75
+                ),
+            )
+        return self._client
+
+    async def request(self, method, url, **kwargs):
+        if self._base_url is not None:
+            new_url = self._url_cache.get(url)
+            if new_url is None:
+                new_url = self._url_cache[url] = urljoin(self._base_url, url)
+            url = new_url
+        resp = await self._getClient().request(method, url, **kwargs)
+        resp.raise_for_status()
+        return resp
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def patch(self, url, **kwargs):
+        return await self.request("PATCH", url, **kwargs)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class asyncWiserHub(wiserHub):
+    """
+    Async variant of wiserHub for asyncio callers such as Home
+    Assistant's event loop.
+
+    The data getters and patch builders are shared with the sync class;
+    all I/O goes through an AsyncCustomSession instead. Unlike wiserHub
+    the constructor performs no I/O, callers must await refreshData()
+    once before using the getters and await close() on shutdown.
+    """
+
+    def __init__(self, hubIP, secret):
+        _LOGGER.info("WiserHub async API Initialised")
+        self.wiserHubData = None
+        self.wiserNetworkData = None
+        self.wiserScheduleData = None
+        self.hubIP = hubIP
+        self.hubSecret = secret
+        self._session = AsyncCustomSession(
+            base_url=WISERBASEURL.format(hubIP), hub_secret=secret
+        )
+        # Dict holding Valve2Room mapping convinience variable
+        self.device2roomMap = {}
+        # TTL cache of GET payloads keyed by URL, see _CACHE_TTLS
+        self._responseCache = {}
+        # Debounced temperature writes: roomId -> pending patch payload
+        self._pendingTempWrites = {}
+        self._tempFlushHandle = None
+
+    def checkHubData(self):
+        """
+        The sync class refreshes inline when data is missing; the shared
+        getters cannot await from here, so callers are told to refresh
+        first instead
+        """
+        if self.wiserHubData is None:
+            raise WiserHubDataNull(
+                "Hub data null, await refreshData() before using the API"
+            )
+
+    def getDeviceRoom(self, deviceId):
+        """
+        Convinience function to return the name of a room which is associated
+        with a device (roomstat or trf)
+
+        The sync method refreshes inline when the map is empty, which an
+        accessor cannot await here; a hub whose rooms hold no devices
+        legitimately leaves the map empty, so the lookup just proceeds
+
+        param deviceId:
+        return: Name of Room associated with a device ID
+        """
+        self.checkHubData()
+        _LOGGER.debug(
+            " getDeviceRoom called, valve2roomMap is {} ".format(self.device2roomMap)
+        )
+        return self.device2roomMap[deviceId]
+
+    async def _makeGetRequest(self, url, sanitize=False):
+        """
+        Issues a GET to the hub and returns the decoded JSON payload
+
+        param url: hub URL relative to the session base
+        param sanitize: strip non-printable characters before parsing,
+            needed for endpoints where the hub can emit invalid JSON
+        return: JSON Data
+        """
+        ttl = _cacheTTL(url)
+        entry = self._responseCache.get(url)
+        if entry is not None and (time.monotonic() - entry.timestamp) < entry.ttl:
+            _LOGGER.debug("Returning cached response for {} ".format(url))
+            return entry.payload
+        try:
+            resp = await self._session.get(url)
+            content = await resp.read()
+        except asyncio.TimeoutError:
+            _LOGGER.debug("Connection timed out trying to update from Wiser Hub")
+            if entry is not None:
+                # Fall back to the last good payload rather than failing
+                # a whole polling cycle on one slow response
+                _LOGGER.warning(
+                    "Wiser Hub timed out, returning stale data for {} ".format(url)
+                )
+                return entry.payload
+            raise WiserHubTimeoutException("The connection timed out.")
+        except aiohttp.ClientResponseError as ex:
+            if ex.status == 401:
+                raise WiserHubAuthenticationException(
+                    "Authentication error.  Check secret key."
+                )
+            elif ex.status in (404, 405):
+                raise WiserRESTException("Not Found.")
+            else:
+                raise WiserRESTException("Unknown Error.")
+        except aiohttp.ClientConnectionError:
+            _LOGGER.debug("Connection error trying to update from Wiser Hub")
+            raise
+        if sanitize:
+            content = content.translate(None, _DELETE_TABLE)
+        payload = _loads(content)
+        if ttl:
+            self._responseCache[url] = _CacheEntry(time.monotonic(), ttl, payload)
+        return payload
+
+    async def _makePatchRequest(self, url, patchData):
+        """
+        Issues a PATCH to the hub and maps HTTP failures onto the module
+        exceptions
+
+        param url: hub URL relative to the session base
+        param patchData: JSON body for the patch
+        return: ClientResponse
+        """
+        _LOGGER.debug("Patching {} with {} ".format(url, patchData))
+        try:
+            # Serialise ourselves and send bytes, bypassing aiohttp's
+            # per-request JSON encoding
+            resp = await self._session.patch(
+                url,
+                data=_dumps(patchData),
+                headers={"Content-Type": "application/json"},
+            )
+            # Drain the (tiny) body so the connection goes back to the
+            # keep-alive pool now rather than when the response is GCed
+            await resp.read()
+        except asyncio.TimeoutError:
+            _LOGGER.debug("Connection timed out patching the Wiser Hub")
+            raise WiserHubTimeoutException("The connection timed out.")
+        except aiohttp.ClientResponseError as ex:
+            _LOGGER.debug("Patch to {} Response code = {}".format(url, ex.status))
+            if ex.status == 401:
+                raise WiserHubAuthenticationException(
+                    "Authentication error.  Check secret key."
+                )
+            elif ex.status in (404, 405):
+                raise WiserNotFound("{} not found error".format(url))
+            else:
+                raise WiserRESTException(
+                    "Error patching {} , error {} {}".format(url, ex.status, ex.message)
+                )
+        except aiohttp.ClientConnectionError:
+            _LOGGER.debug("Connection error patching the Wiser Hub")
+            raise
+        # The write changed hub state, so drop the cached payload for the
+        # endpoint group it touched
+        self.invalidate(url.split("/", 1)[0] + "/")
+        return resp
+
+    async def updateHubData(self):
+        """
+        Fetches the domain data (rooms, devices, system) from the hub
+        return: JSON Data
+        """
+        self.wiserHubData = await self._makeGetRequest(WISERHUBURL)
+        self._buildIndexes()
+        return self.wiserHubData
+
+    async def updateNetworkData(self):
+        """
+        Fetches the network data from the hub. The Wiser Heat Hub can
+        return invalid JSON here, so all non-printable characters are
+        removed before parsing
+        return: JSON Data
+        """
+        self.wiserNetworkData = await self._makeGetRequest(
+            WISERNETWORKURL, sanitize=True
+        )
+        return self.wiserNetworkData
+
+    async def updateScheduleData(self):
+        """
+        Fetches the schedule data from the hub
+        return: JSON Data
+        """
+        self.wiserScheduleData = await self._makeGetRequest(WISERSCHEDULEGETURL)
+        self._scheduleById = {
+            schedule.get("id"): schedule
+            for schedule in self.wiserScheduleData.get("Heating") or []
+        }
+        return self.wiserScheduleData
+
+    async def refreshData(self):
+        """
+        Forces a refresh of data from the wiser hub
+        return: JSON Data
+        """
+        _LOGGER.info("Updating Wiser Hub Data")
+        # The domain/, network/ and schedules/ endpoints are independent,
+        # so fetch them concurrently rather than paying three sequential
+        # round trips
+        tasks = [self.updateHubData()]
+        if self.wiserNetworkData is None:
+            tasks.append(self.updateNetworkData())
+        if self.wiserScheduleData is None:
+            tasks.append(self.updateScheduleData())
+
+        # return_exceptions so one failing endpoint does not discard the
+        # data the others fetched; the first failure is still raised
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        _LOGGER.debug("Wiser Hub Data received {} ".format(self.wiserHubData))
+
+        # Add v2 Schedule data to v2 Hub data so existing HA component will still work
+        self.wiserHubData["Schedule"] = self.wiserScheduleData["Heating"]
+
+        return self.wiserHubData
+
+    async def setHotwaterMode(self, mode):
+        """
+          Switch Hot Water on or off manually, or reset to 'Auto' (schedule).
+          'mode' can be "on", "off" or "auto".
+        """
+        _url, patchData = self._buildHotwaterModePatch(mode)
+        await self._makePatchRequest(_url, patchData)
+        return True
+
+    async def setSystemSwitch(self, switch, mode=False):
+        """
+        Sets a system switch. For details of which switches to set look at the System section of the payload from the wiserhub
+        :param switch: Name of Switch
+        :param mode: Value of mode
+        :return:
+        """
+        await self._makePatchRequest(WISERHUBURL + "System", {switch: mode})
+
+    async def setRoomSchedule(self, roomId, scheduleData: dict):
+        """
+        Sets Room Schedule
+
+        param roomId:
+        param scheduleData: json data for schedule
+        return:
+        """
+        scheduleId = self.getRoom(roomId).get("ScheduleId")
+
+        if scheduleId is None:
+            raise WiserNotFound("No schedule found that matches roomId")
+        await self._makePatchRequest(_scheduleUrl(scheduleId), scheduleData)
+
+    async def setRoomScheduleFromFile(self, roomId, scheduleFile: str):
+        """
+        Sets Room Schedule from a file
+
+        param roomId:
+        param scheduleFile: file containing json schedule data
+        return:
+        """
+        scheduleId = self.getRoom(roomId).get("ScheduleId")
+
+        if scheduleId is None:
+            raise WiserNotFound("No schedule found that matches roomId")
+        if not os.path.exists(scheduleFile):
+            raise FileNotFoundError(
+                "Schedule file, {}, not found.".format(os.path.abspath(scheduleFile))
+            )
+        try:
+            with open(scheduleFile, "r") as f:
+                scheduleData = json.load(f)
+        except:
+            raise Exception("Error reading file {}".format(scheduleFile))
+
+        await self._makePatchRequest(_scheduleUrl(scheduleId), scheduleData)
+
+    async def copyRoomSchedule(self, fromRoomId, toRoomId):
+        """
+        Copies Room Schedule from one room to another
+
+        param fromRoomId:
+        param toRoomId:
+        return: boolean
+        """
+        scheduleData = self.getRoomSchedule(fromRoomId)
+
+        if scheduleData is not None:
+            await self.setRoomSchedule(toRoomId, scheduleData)
+        else:
+            raise WiserNotFound(
+                "Error copying schedule.  One of the room Ids is not valid"
+            )
+
+    async def setHomeAwayMode(self, mode, temperature=10):
+        """
+        Sets default Home or Away mode, optionally allows you to set a temperature for away mode
+
+        param mode: HOME   | AWAY
+
+        param temperature: Temperature between 5-30C or -20 for OFF
+
+        return:
+        """
+        _LOGGER.info("Setting Home/Away mode to : {} {} C".format(mode, temperature))
+        patchData = self._buildHomeAwayPatch(mode, temperature)
+        await self._makePatchRequest(WISERMODEURL, patchData)
+
+    async def setRoomTemperature(self, roomId, temperature):
+        """
+        Sets the room temperature. Rapid calls for the same room within
+        the debounce window coalesce into one PATCH carrying the final
+        value; await flush() to push pending writes out immediately.
+
+        param roomId:  The Room ID
+        param temperature:  The temperature in celcius from 5 to 30, -20 for Off
+        """
+        _LOGGER.info("Set Room {} Temperature to = {} ".format(roomId, temperature))
+        # Validate now so a bad value raises at the call site, not at
+        # flush time
+        patchData = self._buildRoomTempPatch(temperature)
+        self._pendingTempWrites[roomId] = patchData
+        if self._tempFlushHandle is not None:
+            self._tempFlushHandle.cancel()
+        self._tempFlushHandle = asyncio.get_event_loop().call_later(
+            _TEMP_DEBOUNCE_SECONDS, self._scheduleTempFlush
+        )
+
+    def _scheduleTempFlush(self):
+        # call_later callbacks cannot await, so hand off to a task
+        self._tempFlushHandle = None
+        asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        """
+        Sends any pending debounced temperature writes immediately, one
+        concurrent PATCH per room
+        """
+        if self._tempFlushHandle is not None:
+            self._tempFlushHandle.cancel()
+            self._tempFlushHandle = None
+        pending, self._pendingTempWrites = self._pendingTempWrites, {}
+        if not pending:
+            return
+        # return_exceptions so a failure is logged per room instead of
+        # dying unretrieved in the background flush task
+        results = await asyncio.gather(
+            *[
+                self._makePatchRequest(_roomUrl(roomId), patchData)
+                for roomId, patchData in pending.items()
+            ],
+            return_exceptions=True,
+        )
+        for roomId, result in zip(pending, results):
+            if isinstance(result, BaseException):
+                _LOGGER.error(
+                    "Debounced temperature write for room {} failed: {}".format(
+                        roomId, result
+                    )
+                )
+
+    async def _setRoomTemperatureNow(self, roomId, temperature):
+        # Undebounced write used by the batch entry point, which already
+        # carries final values
+        patchData = self._buildRoomTempPatch(temperature)
+        await self._makePatchRequest(_roomUrl(roomId), patchData)
+
+    async def setRoomMode(self, roomId, mode, boost_temp=20, boost_temp_time=30):
+        """
+        Set the Room Mode, this can be Auto, Manual, off or Boost. When you set the mode back to Auto it will automatically take the scheduled temperature
+
+        param roomId: RoomId
+
+        param mode:  Mode (auto, manual off, or boost)
+
+        param boost_temp:  If boosting enter the temperature here in C, can be between 5-30
+
+        param boost_temp_time:  How long to boost for in minutes
+
+        """
+        _LOGGER.debug("Set Mode {} for a room {} ".format(mode, roomId))
+        # The patch carries a RequestOverride alongside the mode for the
+        # non-boost modes, so a single request also cancels any current
+        # boost
+        patchData = self._buildRoomModePatch(roomId, mode, boost_temp, boost_temp_time)
+        await self._makePatchRequest(_roomUrl(roomId), patchData)
+
+    async def _gatherBatch(self, keys, coros):
+        """
+        Awaits the batch coroutines with bounded concurrency and returns
+        a per-key result dict: True on success, the raised exception on
+        failure, so one bad room does not abort the rest of the batch
+        """
+        if len(keys) > _BATCH_LIMIT:
+            for coro in coros:
+                coro.close()
+            raise ValueError(
+                "Batch of {} exceeds the limit of {}".format(len(keys), _BATCH_LIMIT)
+            )
+        semaphore = asyncio.Semaphore(_BATCH_CONCURRENCY)
+
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+
+        results = await asyncio.gather(
+            *[bounded(coro) for coro in coros], return_exceptions=True
+        )
+        return {
+            key: result if isinstance(result, BaseException) else True
+            for key, result in zip(keys, results)
+        }
+
+    async def setRoomTemperatures(self, roomTemperatures: dict):
+        """
+        Sets several room temperatures concurrently
+
+        param roomTemperatures: dict of roomId to temperature
+        return: dict of roomId to True, or to the exception for rooms
+            that failed
+        """
+        return await self._gatherBatch(
+            list(roomTemperatures),
+            [
+                self._setRoomTemperatureNow(roomId, temperature)
+                for roomId, temperature in roomTemperatures.items()
+            ],
+        )
+
+    async def setRoomModes(self, roomModes: dict):
+        """
+        Sets several room modes concurrently
+
+        param roomModes: dict of roomId to mode (auto, manual, off or boost)
+        return: dict of roomId to True, or to the exception for rooms
+            that failed
+        """
+        return await self._gatherBatch(
+            list(roomModes),
+            [self.setRoomMode(roomId, mode) for roomId, mode in roomModes.items()],
+        )
+
+    async def copyRoomScheduleMany(self, fromRoomId, toRoomIds):
+        """
+        Copies one room's schedule to several rooms concurrently
+
+        param fromRoomId:
+        param toRoomIds: list of room ids to copy the schedule to
+        return: dict of toRoomId to True, or to the exception for rooms
+            that failed
+        """
+        return await self._gatherBatch(
+            list(toRoomIds),
+            [self.copyRoomSchedule(fromRoomId, toRoomId) for toRoomId in toRoomIds],
+        )
+
+    async def setSmartPlugState(self, smartPlugId, smartPlugState):
+        if smartPlugState is None:
+            _LOGGER.error("SmartPlug State is None, must be either On or Off")
+            raise ValueError("SmartPlug State is None, must be either On or Off")
+        if smartPlugState.title() not in ["On", "Off"]:
+            _LOGGER.error("SmartPlug State must be either On or Off")
+            raise ValueError("SmartPlug State must be either On or Off")
+
+        patchData = {"RequestOutput": smartPlugState.title()}
+        await self._makePatchRequest(_smartPlugUrl(smartPlugId), patchData)
+
+    async def setSmartPlugMode(self, smartPlugId, smartPlugMode):
+
+        if smartPlugMode.title() not in ["Auto", "Manual"]:
+            _LOGGER.error("SmartPlug Mode must be either Auto or Manual")
+            raise ValueError("SmartPlug Mode must be either Auto or Manual")
+
+        patchData = {"Mode": smartPlugMode.title()}
+        await self._makePatchRequest(_smartPlugUrl(smartPlugId), patchData)
+
+    async def close(self):
+        """
+        Pushes out any pending debounced writes and releases the
+        connection pool, for use on shutdown
+        """
+        await self.flush()
+        await self._session.close()